@@ -4,7 +4,6 @@
 from __future__ import annotations
 
 import itertools
-from typing import Iterable
 
 import pytest
 
@@ -17,13 +16,28 @@ from pants.backend.python.util_rules.lockfile_metadata import (
     PythonLockfileMetadataV3,
 )
 from pants.core.util_rules.lockfile_metadata import calculate_invalidation_digest
+from pants.util.memo import memoized
 from pants.util.pip_requirement import PipRequirement
 
-INTERPRETER_UNIVERSE = ["2.7", "3.5", "3.6", "3.7", "3.8", "3.9", "3.10"]
+INTERPRETER_UNIVERSE = ("2.7", "3.5", "3.6", "3.7", "3.8", "3.9", "3.10")
 
 
-def reqset(*a) -> set[PipRequirement]:
-    return {PipRequirement.parse(i) for i in a}
+@memoized
+def _parse(s: str) -> PipRequirement:
+    return PipRequirement.parse(s)
+
+
+@memoized
+def reqset(*a: str) -> frozenset[PipRequirement]:
+    return frozenset(_parse(i) for i in a)
+
+
+# Read-only inputs shared between tests.
+_EMPTY_REQS: frozenset[PipRequirement] = frozenset()
+_EMPTY_STRS: frozenset[str] = frozenset()
+_CONSTRAINT = frozenset({_parse("constraint")})
+_BDIST = frozenset({"bdist"})
+_SDIST = frozenset({"sdist"})
 
 
 def test_metadata_header_round_trip() -> None:
@@ -31,11 +45,11 @@ def test_metadata_header_round_trip() -> None:
         valid_for_interpreter_constraints=InterpreterConstraints(
             ["CPython==2.7.*", "PyPy", "CPython>=3.6,<4,!=3.7.*"]
         ),
-        requirements=reqset("ansicolors==0.1.0"),
+        requirements=set(reqset("ansicolors==0.1.0")),
         manylinux="manylinux2014",
-        requirement_constraints={PipRequirement.parse("constraint")},
-        only_binary={"bdist"},
-        no_binary={"sdist"},
+        requirement_constraints=set(_CONSTRAINT),
+        only_binary=set(_BDIST),
+        no_binary=set(_SDIST),
     )
     serialized_lockfile = input_metadata.add_header_to_lockfile(
         b"req1==1.0", regenerate_command="./pants lock", delimeter="#"
@@ -46,12 +60,11 @@ def test_metadata_header_round_trip() -> None:
     assert input_metadata == output_metadata
 
 
-def test_add_header_to_lockfile() -> None:
-    input_lockfile = b"""dave==3.1.4 \\
-    --hash=sha256:cab0c0c0c0c0dadacafec0c0c0c0cafedadabeefc0c0c0c0feedbeeffeedbeef \\
-    """
+def _canon(b: bytes) -> bytes:
+    return b"\n".join(i for i in (j.strip() for j in b.splitlines()) if i)
+
 
-    expected = b"""
+_EXPECTED_BYTES = b"""
 # This lockfile was autogenerated by Pants. To regenerate, run:
 #
 #    ./pants lock
@@ -81,21 +94,26 @@ dave==3.1.4 \\
     --hash=sha256:cab0c0c0c0c0dadacafec0c0c0c0cafedadabeefc0c0c0c0feedbeeffeedbeef \\
     """
 
-    def line_by_line(b: bytes) -> list[bytes]:
-        return [i for i in (j.strip() for j in b.splitlines()) if i]
+_EXPECTED_CANONICAL = _canon(_EXPECTED_BYTES)
+
+
+def test_add_header_to_lockfile() -> None:
+    input_lockfile = b"""dave==3.1.4 \\
+    --hash=sha256:cab0c0c0c0c0dadacafec0c0c0c0cafedadabeefc0c0c0c0feedbeeffeedbeef \\
+    """
 
     metadata = PythonLockfileMetadata.new(
         valid_for_interpreter_constraints=InterpreterConstraints([">=3.7"]),
-        requirements=reqset("ansicolors==0.1.0"),
+        requirements=set(reqset("ansicolors==0.1.0")),
         manylinux=None,
-        requirement_constraints={PipRequirement.parse("constraint")},
-        only_binary={"bdist"},
-        no_binary={"sdist"},
+        requirement_constraints=set(_CONSTRAINT),
+        only_binary=set(_BDIST),
+        no_binary=set(_SDIST),
     )
     result = metadata.add_header_to_lockfile(
         input_lockfile, regenerate_command="./pants lock", delimeter="#"
     )
-    assert line_by_line(result) == line_by_line(expected)
+    assert _canon(result) == _EXPECTED_CANONICAL
 
 
 def test_invalidation_digest() -> None:
@@ -103,19 +121,18 @@ def test_invalidation_digest() -> None:
     b = "flake8-2020>=1.6.0,<1.7.0"
     c = "flake8"
 
-    def assert_eq(left: Iterable[str], right: Iterable[str]) -> None:
-        assert calculate_invalidation_digest(left) == calculate_invalidation_digest(right)
+    ref = calculate_invalidation_digest([a, b, c])
+    ref_ab = calculate_invalidation_digest([a, b])
+    ref_empty = calculate_invalidation_digest([])
+    ref_a = calculate_invalidation_digest([a])
 
-    def assert_neq(left: Iterable[str], right: Iterable[str]) -> None:
-        assert calculate_invalidation_digest(left) != calculate_invalidation_digest(right)
+    digests = {calculate_invalidation_digest(reqs) for reqs in itertools.permutations([a, b, c])}
+    assert digests == {ref}
+    assert ref != ref_ab
 
-    for reqs in itertools.permutations([a, b, c]):
-        assert_eq(reqs, [a, b, c])
-        assert_neq(reqs, [a, b])
-
-    assert_eq([], [])
-    assert_neq([], [a])
-    assert_eq([a, a, a, a], [a])
+    assert calculate_invalidation_digest([]) == ref_empty
+    assert ref_empty != ref_a
+    assert calculate_invalidation_digest([a, a, a, a]) == ref_a
 
 
 @pytest.mark.parametrize(
@@ -171,105 +188,118 @@ def test_is_valid_for_v1(user_digest, expected_digest, user_ic, expected_ic, mat
                 expected_invalidation_digest=user_digest,
                 user_interpreter_constraints=InterpreterConstraints(user_ic),
                 interpreter_universe=INTERPRETER_UNIVERSE,
-                user_requirements=set(),
+                user_requirements=_EMPTY_REQS,
                 manylinux=None,
-                requirement_constraints=set(),
-                only_binary=set(),
-                no_binary=set(),
+                requirement_constraints=_EMPTY_REQS,
+                only_binary=_EMPTY_STRS,
+                no_binary=_EMPTY_STRS,
             )
         )
         == matches
     )
 
 
-_VALID_ICS = [">=3.5"]
-_VALID_REQS = ["ansicolors==0.1.0", "requests==1.0.0"]
+_VALID_ICS = (">=3.5",)
+_VALID_REQS = ("ansicolors==0.1.0", "requests==1.0.0")
 
+# Built once at import time and shared between parametrized rows.
+_VALID_ICS_OBJ = InterpreterConstraints(_VALID_ICS)
+_ICS_27 = InterpreterConstraints(["==2.7.*"])
+_VALID_REQS_SET = reqset(*_VALID_REQS)
+_REVERSED_REQS_SET = reqset(*reversed(_VALID_REQS))
 
-@pytest.mark.parametrize(
-    "lock_ics, user_ics, lock_reqs, user_reqs, expected",
+_LockfileConditions = (
+    (_VALID_ICS_OBJ, _VALID_ICS_OBJ, _VALID_REQS_SET, _VALID_REQS_SET, frozenset()),
+    (_VALID_ICS_OBJ, _VALID_ICS_OBJ, _VALID_REQS_SET, _REVERSED_REQS_SET, frozenset()),
     (
-        [_VALID_ICS, _VALID_ICS, _VALID_REQS, _VALID_REQS, []],
-        [_VALID_ICS, _VALID_ICS, _VALID_REQS, list(reversed(_VALID_REQS)), []],
-        [
-            _VALID_ICS,
-            _VALID_ICS,
-            _VALID_REQS,
-            [_VALID_REQS[0], "requests==2.0.0"],
-            [InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH],
-        ],
-        [
-            _VALID_ICS,
-            _VALID_ICS,
-            _VALID_REQS,
-            [_VALID_REQS[0], "different"],
-            [InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH],
-        ],
-        [
-            _VALID_ICS,
-            _VALID_ICS,
-            _VALID_REQS,
-            [*_VALID_REQS, "a-third-req"],
-            [InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH],
-        ],
-        [
-            _VALID_ICS,
-            ["==2.7.*"],
-            _VALID_REQS,
-            _VALID_REQS,
-            [InvalidPythonLockfileReason.INTERPRETER_CONSTRAINTS_MISMATCH],
-        ],
-        [_VALID_ICS, _VALID_ICS, _VALID_REQS, [_VALID_REQS[0]], []],
+        _VALID_ICS_OBJ,
+        _VALID_ICS_OBJ,
+        _VALID_REQS_SET,
+        reqset(_VALID_REQS[0], "requests==2.0.0"),
+        frozenset({InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH}),
     ),
+    (
+        _VALID_ICS_OBJ,
+        _VALID_ICS_OBJ,
+        _VALID_REQS_SET,
+        reqset(_VALID_REQS[0], "different"),
+        frozenset({InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH}),
+    ),
+    (
+        _VALID_ICS_OBJ,
+        _VALID_ICS_OBJ,
+        _VALID_REQS_SET,
+        reqset(*_VALID_REQS, "a-third-req"),
+        frozenset({InvalidPythonLockfileReason.REQUIREMENTS_MISMATCH}),
+    ),
+    (
+        _VALID_ICS_OBJ,
+        _ICS_27,
+        _VALID_REQS_SET,
+        _VALID_REQS_SET,
+        frozenset({InvalidPythonLockfileReason.INTERPRETER_CONSTRAINTS_MISMATCH}),
+    ),
+    (_VALID_ICS_OBJ, _VALID_ICS_OBJ, _VALID_REQS_SET, reqset(_VALID_REQS[0]), frozenset()),
 )
+
+
+@memoized
+def _v2(ics: InterpreterConstraints, reqs: frozenset[PipRequirement]) -> PythonLockfileMetadataV2:
+    return PythonLockfileMetadataV2(ics, set(reqs))
+
+
+@memoized
+def _v3(ics: InterpreterConstraints, reqs: frozenset[PipRequirement]) -> PythonLockfileMetadataV3:
+    return PythonLockfileMetadataV3(
+        ics,
+        set(reqs),
+        manylinux=None,
+        requirement_constraints=set(),
+        only_binary=set(),
+        no_binary=set(),
+    )
+
+
+@pytest.mark.parametrize("lock_ics, user_ics, lock_reqs, user_reqs, expected", _LockfileConditions)
 def test_is_valid_for_interpreter_constraints_and_requirements(
-    user_ics: list[str],
-    lock_ics: list[str],
-    user_reqs: list[str],
-    lock_reqs: list[str],
-    expected: list[InvalidPythonLockfileReason],
+    user_ics: InterpreterConstraints,
+    lock_ics: InterpreterConstraints,
+    user_reqs: frozenset[PipRequirement],
+    lock_reqs: frozenset[PipRequirement],
+    expected: frozenset[InvalidPythonLockfileReason],
 ) -> None:
     """This logic is used by V2 and newer."""
-    for m in [
-        PythonLockfileMetadataV2(InterpreterConstraints(lock_ics), reqset(*lock_reqs)),
-        PythonLockfileMetadataV3(
-            InterpreterConstraints(lock_ics),
-            reqset(*lock_reqs),
-            manylinux=None,
-            requirement_constraints=set(),
-            only_binary=set(),
-            no_binary=set(),
-        ),
-    ]:
+    m: PythonLockfileMetadata
+    for m in (_v2(lock_ics, lock_reqs), _v3(lock_ics, lock_reqs)):
         result = m.is_valid_for(
             expected_invalidation_digest="",
-            user_interpreter_constraints=InterpreterConstraints(user_ics),
+            user_interpreter_constraints=user_ics,
             interpreter_universe=INTERPRETER_UNIVERSE,
-            user_requirements=reqset(*user_reqs),
+            user_requirements=user_reqs,
             manylinux=None,
-            requirement_constraints=set(),
-            only_binary=set(),
-            no_binary=set(),
+            requirement_constraints=_EMPTY_REQS,
+            only_binary=_EMPTY_STRS,
+            no_binary=_EMPTY_STRS,
         )
-        assert result.failure_reasons == set(expected)
+        assert result.failure_reasons == expected
 
 
 def test_is_valid_for_v3_metadata() -> None:
     result = PythonLockfileMetadataV3(
         InterpreterConstraints([]),
-        reqset(),
+        set(),
         # Everything below is new to v3+.
         manylinux=None,
-        requirement_constraints={PipRequirement.parse("c1")},
-        only_binary={"bdist"},
-        no_binary={"sdist"},
+        requirement_constraints={_parse("c1")},
+        only_binary=set(_BDIST),
+        no_binary=set(_SDIST),
     ).is_valid_for(
         expected_invalidation_digest="",
         user_interpreter_constraints=InterpreterConstraints([]),
         interpreter_universe=INTERPRETER_UNIVERSE,
-        user_requirements=reqset(),
+        user_requirements=_EMPTY_REQS,
         manylinux="manylinux2014",
-        requirement_constraints={PipRequirement.parse("c2")},
+        requirement_constraints={_parse("c2")},
         only_binary={"not-bdist"},
         no_binary={"not-sdist"},
     )